@@ -1,17 +1,46 @@
 #!/usr/bin/env python3
+import argparse
+import functools
+import multiprocessing
 import os
+import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 try:
     from PIL import Image
-    import cairosvg
+    from cairosvg.parser import Tree
+    from cairosvg.surface import PNGSurface
 except ImportError:
     print("正在安装必要的库...")
     import subprocess
     subprocess.check_call([sys.executable, "-m", "pip", "install", "pillow", "cairosvg"])
     from PIL import Image
-    import cairosvg
+    from cairosvg.parser import Tree
+    from cairosvg.surface import PNGSurface
+
+# pyvips 为可选依赖 (libvips + librsvg)，安装后用于更快的 SVG 栅格化
+try:
+    import pyvips
+    # 未带 librsvg 编译的 libvips 没有 svgload，此时仍使用 cairosvg
+    if not pyvips.type_find("VipsForeign", "svgload"):
+        pyvips = None
+except (ImportError, OSError):
+    # 只装了 pyvips 而系统缺少 libvips 时，导入会抛出 OSError
+    pyvips = None
+
+# fpnge 为可选依赖 (SIMD 加速的 PNG 编码器)，安装后用于快速编码
+try:
+    import fpnge
+except ImportError:
+    fpnge = None
+
+# icnsutil 为可选依赖，安装后直接写出 ICNS，不再依赖 macOS 的 iconutil
+try:
+    import icnsutil
+except ImportError:
+    icnsutil = None
 
 # 路径设置
 script_dir = Path(__file__).parent
@@ -22,6 +51,9 @@ iconset_dir = resources_dir / "icon.iconset"
 # 创建 iconset 目录
 iconset_dir.mkdir(exist_ok=True)
 
+# 两个图标脚本写入同一批文件，用标记文件记录上次由哪个脚本生成，换脚本时需要全部重新生成
+stamp_path = iconset_dir / ".generator"
+
 # 定义需要生成的尺寸
 sizes = [
     (16, "icon_16x16.png"),
@@ -39,36 +71,157 @@ sizes = [
     (1024, "icon_1024x1024.png"),
 ]
 
-def svg_to_png(svg_path, png_path, size):
-    """将 SVG 转换为指定尺寸的 PNG"""
-    cairosvg.svg2png(
-        url=str(svg_path),
-        write_to=str(png_path),
+# ICNS 各类型对应的 iconset 文件 (与 iconutil 的输出一致)
+icns_media = [
+    ("icp4", "icon_16x16.png"),
+    ("icp5", "icon_32x32.png"),
+    ("ic11", "icon_16x16@2x.png"),
+    ("ic12", "icon_32x32@2x.png"),
+    ("ic07", "icon_128x128.png"),
+    ("ic13", "icon_128x128@2x.png"),
+    ("ic08", "icon_256x256.png"),
+    ("ic14", "icon_256x256@2x.png"),
+    ("ic09", "icon_512x512.png"),
+    ("ic10", "icon_512x512@2x.png"),
+]
+
+# 按像素尺寸分组，相同尺寸只需渲染一次
+size_groups = {}
+for size, name in sizes:
+    size_groups.setdefault(size, []).append(name)
+
+@functools.lru_cache(maxsize=None)
+def load_svg_tree(svg_path):
+    """解析 SVG 文件 (每个路径只解析一次，后续渲染复用)"""
+    return Tree(url=str(svg_path))
+
+@functools.lru_cache(maxsize=None)
+def svg_base_size(svg_path):
+    """SVG 在 scale=1 时的像素宽度，作为 pyvips 缩放的基准"""
+    return pyvips.Image.svgload(str(svg_path)).width
+
+def vips_render_svg(svg_path, size):
+    """用 libvips 将 SVG 渲染为指定尺寸的 pyvips 图像"""
+    return pyvips.Image.svgload(str(svg_path), scale=size / svg_base_size(svg_path))
+
+def render_svg(svg_path, size):
+    """将 SVG 渲染为指定尺寸的 RGBA 图像"""
+    if pyvips is not None:
+        img = vips_render_svg(svg_path, size)
+        return Image.frombuffer('RGBA', (img.width, img.height), img.write_to_memory(), 'raw', 'RGBA', 0, 1)
+    # cairosvg.svg2png 每次都会重新读取并解析 SVG，这里直接用缓存的树构建 surface
+    surface = PNGSurface(
+        load_svg_tree(svg_path),
+        None,
+        96,
         output_width=size,
         output_height=size
+    ).cairo
+    surface.flush()
+    # cairo 的 ARGB32 为预乘 alpha、按本机字节序存储 (小端下即 BGRa)
+    return Image.frombuffer(
+        'RGBA',
+        (surface.get_width(), surface.get_height()),
+        bytes(surface.get_data()),
+        'raw', 'BGRa', surface.get_stride(), 1
     )
 
-def generate_main_png():
+def svg_to_png(svg_path, png_path, size, compress_level=1):
+    """将 SVG 转换为指定尺寸的 PNG"""
+    # 没有 fpnge 时直接用 libvips 渲染并编码，不经过 Pillow
+    if pyvips is not None and fpnge is None:
+        img = vips_render_svg(svg_path, size)
+        img.write_to_file(str(png_path), compression=compress_level)
+        return
+    # cairo 自带的 PNG 写入无法调整压缩级别，改由 Pillow 以低压缩级别快速编码
+    img = render_svg(svg_path, size)
+    # fpnge 不支持调节压缩级别，只用于快速编码，需要高压缩时仍交给 Pillow
+    if fpnge is not None and compress_level <= 1:
+        Path(png_path).write_bytes(fpnge.fromPIL(img))
+        return
+    img.save(png_path, 'PNG', compress_level=compress_level, optimize=False)
+
+def link_or_copy(src, dst):
+    """用硬链接复制文件，不支持时退回到普通复制"""
+    if dst.exists():
+        dst.unlink()
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+def generated_by_this_script():
+    """上次生成图标的是否为本脚本"""
+    return stamp_path.exists() and stamp_path.read_text(encoding="utf-8").strip() == Path(__file__).name
+
+def is_up_to_date(output_path, src_mtime):
+    """输出文件已存在且不早于所有输入时返回 True"""
+    return output_path.exists() and output_path.stat().st_mtime >= src_mtime
+
+def _render_one(group):
+    """渲染同一尺寸的一组 iconset 图标 (在子进程中执行)"""
+    size, names = group
+    first_path = iconset_dir / names[0]
+    svg_to_png(svg_path, first_path, size)
+    for name in names[1:]:
+        link_or_copy(first_path, iconset_dir / name)
+    return names
+
+def generate_main_png(src_mtime):
     """生成主 PNG 图标"""
     print("生成主 PNG 图标...")
     png_path = resources_dir / "icon.png"
+    if is_up_to_date(png_path, src_mtime):
+        print("✓ icon.png 已是最新，跳过")
+        return
     svg_to_png(svg_path, png_path, 1024)
     print(f"✓ icon.png 已生成")
 
-def generate_iconset():
+def generate_iconset(src_mtime):
     """生成 iconset 中的所有尺寸"""
     print("生成 iconset 图标...")
-    for size, name in sizes:
-        png_path = iconset_dir / name
-        svg_to_png(svg_path, png_path, size)
-        print(f"✓ {name} 已生成")
+    stale_groups = [
+        (size, names) for size, names in size_groups.items()
+        if not all(is_up_to_date(iconset_dir / name, src_mtime) for name in names)
+    ]
+    if not stale_groups:
+        print("✓ iconset 已是最新，跳过")
+        return
+    # 各尺寸相互独立，分发到多个进程并行渲染；
+    # 父进程里 libvips 已启动工作线程，fork 出的子进程会死锁，因此用 spawn 启动
+    with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as executor:
+        for names in executor.map(_render_one, stale_groups):
+            for name in names:
+                print(f"✓ {name} 已生成")
+
+def recompress_release_pngs():
+    """发布前以最高压缩级别重新保存最终分发的大尺寸 PNG"""
+    print("以最高压缩级别重新保存 PNG...")
+    for png_path in [resources_dir / "icon.png", iconset_dir / "icon_1024x1024.png"]:
+        with Image.open(png_path) as src:
+            img = src.copy()
+        img.save(png_path, 'PNG', compress_level=9)
+        print(f"✓ {png_path.name} 已重新压缩")
 
-def generate_icns():
+def generate_icns(src_mtime):
     """生成 ICNS (macOS)"""
     print("生成 ICNS 图标...")
     import subprocess
+    icns_path = resources_dir / "icon.icns"
+    # ICNS 由 iconset 打包而来，需要同时比较 iconset 中每个文件的修改时间
+    inputs_mtime = max([src_mtime] + [(iconset_dir / name).stat().st_mtime for _, name in sizes])
+    if is_up_to_date(icns_path, inputs_mtime):
+        print("✓ icon.icns 已是最新，跳过")
+        return
+    if icnsutil is not None:
+        # iconset 中的 PNG 已经编码好，直接装入 ICNS 容器，无需启动 iconutil
+        icns = icnsutil.IcnsFile()
+        for key, name in icns_media:
+            icns.add_media(key, data=(iconset_dir / name).read_bytes())
+        icns.write(str(icns_path), toc=True)
+        print("✓ icon.icns 已生成")
+        return
     try:
-        icns_path = resources_dir / "icon.icns"
         subprocess.run(
             ["iconutil", "-c", "icns", str(iconset_dir), "-o", str(icns_path)],
             check=True,
@@ -81,51 +234,69 @@ def generate_icns():
     except FileNotFoundError:
         print("iconutil 命令未找到，请确保在 macOS 上运行")
 
-def generate_ico():
+def generate_ico(src_mtime):
     """生成 ICO (Windows)"""
     print("生成 ICO 图标...")
+    ico_path = resources_dir / "icon.ico"
+    if is_up_to_date(ico_path, src_mtime):
+        print("✓ icon.ico 已是最新，跳过")
+        return
     try:
         # 生成多个尺寸用于 ICO
         ico_sizes = [16, 32, 48, 64, 128, 256]
         images = []
         
         for size in ico_sizes:
-            # 先转换为 PNG
-            temp_png = f"/tmp/icon_{size}.png"
-            svg_to_png(svg_path, temp_png, size)
-            img = Image.open(temp_png)
-            images.append(img)
+            # 直接取渲染结果的像素数据，省去 PNG 编码和解码
+            images.append(render_svg(svg_path, size))
         
-        # 保存为 ICO
-        ico_path = resources_dir / "icon.ico"
-        images[0].save(
+        # 保存为 ICO (以最大尺寸为主图，Pillow 会丢弃大于主图的尺寸)
+        images[-1].save(
             ico_path,
             format='ICO',
-            sizes=[(img.width, img.height) for img in images]
+            sizes=[(img.width, img.height) for img in images],
+            append_images=images[:-1]
         )
         
-        # 清理临时文件
-        for size in ico_sizes:
-            temp_png = f"/tmp/icon_{size}.png"
-            if os.path.exists(temp_png):
-                os.remove(temp_png)
-        
         print("✓ icon.ico 已生成")
     except Exception as e:
         print(f"生成 ICO 失败: {e}")
 
 def main():
+    parser = argparse.ArgumentParser(description="从 icon.svg 生成各平台应用图标")
+    parser.add_argument(
+        "--release",
+        action="store_true",
+        help="以最高压缩级别重新保存 icon.png 和 1024px 图标"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略修改时间，重新生成所有图标"
+    )
+    args = parser.parse_args()
+
     print("开始生成图标...\n")
     
     if not svg_path.exists():
         print(f"错误: SVG 文件不存在: {svg_path}")
         sys.exit(1)
     
+    # 输出文件比 SVG 和本脚本都新时跳过；--force 或上次由另一个脚本生成时全部重新生成
+    if args.force or not generated_by_this_script():
+        src_mtime = float("inf")
+        stamp_path.unlink(missing_ok=True)
+    else:
+        src_mtime = max(svg_path.stat().st_mtime, Path(__file__).stat().st_mtime)
+    
     try:
-        generate_main_png()
-        generate_iconset()
-        generate_icns()
-        generate_ico()
+        generate_main_png(src_mtime)
+        generate_iconset(src_mtime)
+        if args.release:
+            recompress_release_pngs()
+        generate_icns(src_mtime)
+        generate_ico(src_mtime)
+        stamp_path.write_text(Path(__file__).name, encoding="utf-8")
         
         print("\n✓ 所有图标生成完成！")
     except Exception as e:
@@ -1,16 +1,73 @@
 #!/usr/bin/env python3
+import argparse
+import functools
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import SimpleNamespace
+
+def cpu_has_avx2():
+    """检测 CPU 是否支持 AVX2 (Linux 读取 /proc/cpuinfo，macOS 查询 sysctl)"""
+    import subprocess
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            return any(line.startswith("flags") and "avx2" in line.split() for line in f)
+    except OSError:
+        pass
+    try:
+        result = subprocess.run(
+            ["sysctl", "-n", "machdep.cpu.leaf7_features"],
+            capture_output=True,
+            text=True
+        )
+        return "AVX2" in result.stdout.split()
+    except OSError:
+        return False
+
+def install_pillow():
+    """安装 Pillow；支持 AVX2 的 x86_64 上优先编译安装 Pillow-SIMD (版本见 requirements-icons-simple.txt)"""
+    import platform
+    import subprocess
+    # 不支持 AVX2 的 CPU 上 -mavx2 编译同样会成功，但加载时会因非法指令崩溃，必须先检测
+    if platform.machine().lower() in ("x86_64", "amd64") and cpu_has_avx2():
+        requirements = Path(__file__).parent / "requirements-icons-simple.txt"
+        try:
+            subprocess.check_call(
+                [sys.executable, "-m", "pip", "install", "--no-binary", ":all:", "-r", str(requirements)],
+                env=dict(os.environ, CC="cc -mavx2")
+            )
+            return
+        except subprocess.CalledProcessError:
+            print("Pillow-SIMD 编译失败，改为安装 Pillow...")
+    subprocess.check_call([sys.executable, "-m", "pip", "install", "pillow"])
 
 try:
     from PIL import Image, ImageDraw, ImageFont
 except ImportError:
     print("正在安装 Pillow...")
-    import subprocess
-    subprocess.check_call([sys.executable, "-m", "pip", "install", "pillow"])
+    install_pillow()
     from PIL import Image, ImageDraw, ImageFont
 
+# OpenCV 为可选依赖，安装后用于更快的 PNG 编码
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+
+# fpnge 为可选依赖 (SIMD 加速的 PNG 编码器)，安装后优先用于快速编码
+try:
+    import fpnge
+except ImportError:
+    fpnge = None
+
+# icnsutil 为可选依赖，安装后直接写出 ICNS，不再依赖 macOS 的 iconutil
+try:
+    import icnsutil
+except ImportError:
+    icnsutil = None
+
 # 路径设置
 script_dir = Path(__file__).parent
 resources_dir = script_dir.parent / "resources"
@@ -19,6 +76,9 @@ iconset_dir = resources_dir / "icon.iconset"
 # 创建 iconset 目录
 iconset_dir.mkdir(exist_ok=True)
 
+# 两个图标脚本写入同一批文件，用标记文件记录上次由哪个脚本生成，换脚本时需要全部重新生成
+stamp_path = iconset_dir / ".generator"
+
 # 定义需要生成的尺寸
 sizes = [
     (16, "icon_16x16.png"),
@@ -36,145 +96,229 @@ sizes = [
     (1024, "icon_1024x1024.png"),
 ]
 
+# ICNS 各类型对应的 iconset 文件 (与 iconutil 的输出一致)
+icns_media = [
+    ("icp4", "icon_16x16.png"),
+    ("icp5", "icon_32x32.png"),
+    ("ic11", "icon_16x16@2x.png"),
+    ("ic12", "icon_32x32@2x.png"),
+    ("ic07", "icon_128x128.png"),
+    ("ic13", "icon_128x128@2x.png"),
+    ("ic08", "icon_256x256.png"),
+    ("ic14", "icon_256x256@2x.png"),
+    ("ic09", "icon_512x512.png"),
+    ("ic10", "icon_512x512@2x.png"),
+]
+
+# Apple 蓝色渐变背景 (简化为单色)
+BG_COLOR = (0, 122, 255)  # #007AFF
+
+@functools.lru_cache(maxsize=None)
+def _geom(size):
+    """计算指定尺寸下各部件的像素坐标 (同一尺寸只计算一次)"""
+    # 计算缩放比例
+    scale = size / 1024
+    # 机器人中心位置
+    center_x = size // 2
+    center_y = size // 2
+    head_width = int(360 * scale)
+    return SimpleNamespace(
+        center_x=center_x,
+        center_y=center_y,
+        # 圆角矩形背景
+        margin=int(102 * scale),
+        bg_size=int(820 * scale),
+        corner_radius=int(180 * scale),
+        # 机器人头部
+        head_width=head_width,
+        head_height=int(280 * scale),
+        head_x=center_x - head_width // 2,
+        head_y=center_y - int(120 * scale),
+        head_corner=int(40 * scale),
+        # 天线
+        antenna_width=int(12 * scale),
+        antenna_top=center_y - int(200 * scale),
+        antenna_bottom=center_y - int(120 * scale),
+        ball_radius=int(24 * scale),
+        # 眼睛
+        eye_radius=int(32 * scale),
+        left_eye_x=center_x - int(80 * scale),
+        right_eye_x=center_x + int(80 * scale),
+        eye_y=center_y - int(40 * scale),
+        # 嘴巴
+        mouth_y=center_y + int(40 * scale),
+        mouth_width=int(120 * scale),
+        mouth_height=int(40 * scale),
+        mouth_line=int(12 * scale),
+        # 耳朵
+        ear_width=int(40 * scale),
+        ear_height=int(80 * scale),
+        ear_corner=int(20 * scale),
+        left_ear_x=center_x - int(220 * scale),
+        right_ear_x=center_x + int(180 * scale),
+        ear_y=center_y - int(60 * scale),
+    )
+
 def create_bot_icon(size):
     """创建 Bot 机器人图标"""
     # 创建图像
     img = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
     
-    # 计算缩放比例
-    scale = size / 1024
-    
-    # Apple 蓝色渐变背景 (简化为单色)
-    bg_color = (0, 122, 255)  # #007AFF
+    g = _geom(size)
     
     # 绘制圆角矩形背景
-    margin = int(102 * scale)
-    bg_size = int(820 * scale)
-    corner_radius = int(180 * scale)
-    
     draw.rounded_rectangle(
-        [margin, margin, margin + bg_size, margin + bg_size],
-        radius=corner_radius,
-        fill=bg_color
+        [g.margin, g.margin, g.margin + g.bg_size, g.margin + g.bg_size],
+        radius=g.corner_radius,
+        fill=BG_COLOR
     )
     
-    # 机器人中心位置
-    center_x = size // 2
-    center_y = size // 2
-    
     # 机器人头部
-    head_width = int(360 * scale)
-    head_height = int(280 * scale)
-    head_x = center_x - head_width // 2
-    head_y = center_y - int(120 * scale)
-    head_corner = int(40 * scale)
-    
     draw.rounded_rectangle(
-        [head_x, head_y, head_x + head_width, head_y + head_height],
-        radius=head_corner,
+        [g.head_x, g.head_y, g.head_x + g.head_width, g.head_y + g.head_height],
+        radius=g.head_corner,
         fill='white'
     )
     
     # 天线
-    antenna_width = int(12 * scale)
-    antenna_top = center_y - int(200 * scale)
-    antenna_bottom = center_y - int(120 * scale)
-    
     draw.line(
-        [(center_x, antenna_bottom), (center_x, antenna_top)],
+        [(g.center_x, g.antenna_bottom), (g.center_x, g.antenna_top)],
         fill='white',
-        width=antenna_width
+        width=g.antenna_width
     )
     
     # 天线顶部圆球
-    ball_radius = int(24 * scale)
     draw.ellipse(
-        [center_x - ball_radius, antenna_top - ball_radius,
-         center_x + ball_radius, antenna_top + ball_radius],
+        [g.center_x - g.ball_radius, g.antenna_top - g.ball_radius,
+         g.center_x + g.ball_radius, g.antenna_top + g.ball_radius],
         fill='white'
     )
     
     # 左眼
-    eye_radius = int(32 * scale)
-    left_eye_x = center_x - int(80 * scale)
-    eye_y = center_y - int(40 * scale)
-    
     draw.ellipse(
-        [left_eye_x - eye_radius, eye_y - eye_radius,
-         left_eye_x + eye_radius, eye_y + eye_radius],
-        fill=bg_color
+        [g.left_eye_x - g.eye_radius, g.eye_y - g.eye_radius,
+         g.left_eye_x + g.eye_radius, g.eye_y + g.eye_radius],
+        fill=BG_COLOR
     )
     
     # 右眼
-    right_eye_x = center_x + int(80 * scale)
-    
     draw.ellipse(
-        [right_eye_x - eye_radius, eye_y - eye_radius,
-         right_eye_x + eye_radius, eye_y + eye_radius],
-        fill=bg_color
+        [g.right_eye_x - g.eye_radius, g.eye_y - g.eye_radius,
+         g.right_eye_x + g.eye_radius, g.eye_y + g.eye_radius],
+        fill=BG_COLOR
     )
     
     # 嘴巴 (简化为弧线)
-    mouth_y = center_y + int(40 * scale)
-    mouth_width = int(120 * scale)
-    mouth_height = int(40 * scale)
-    
     draw.arc(
-        [center_x - mouth_width // 2, mouth_y - mouth_height // 2,
-         center_x + mouth_width // 2, mouth_y + mouth_height // 2],
+        [g.center_x - g.mouth_width // 2, g.mouth_y - g.mouth_height // 2,
+         g.center_x + g.mouth_width // 2, g.mouth_y + g.mouth_height // 2],
         start=0, end=180,
-        fill=bg_color,
-        width=int(12 * scale)
+        fill=BG_COLOR,
+        width=g.mouth_line
     )
     
     # 左耳
-    ear_width = int(40 * scale)
-    ear_height = int(80 * scale)
-    ear_corner = int(20 * scale)
-    left_ear_x = center_x - int(220 * scale)
-    ear_y = center_y - int(60 * scale)
-    
     draw.rounded_rectangle(
-        [left_ear_x, ear_y, left_ear_x + ear_width, ear_y + ear_height],
-        radius=ear_corner,
+        [g.left_ear_x, g.ear_y, g.left_ear_x + g.ear_width, g.ear_y + g.ear_height],
+        radius=g.ear_corner,
         fill='white'
     )
     
     # 右耳
-    right_ear_x = center_x + int(180 * scale)
-    
     draw.rounded_rectangle(
-        [right_ear_x, ear_y, right_ear_x + ear_width, ear_y + ear_height],
-        radius=ear_corner,
+        [g.right_ear_x, g.ear_y, g.right_ear_x + g.ear_width, g.ear_y + g.ear_height],
+        radius=g.ear_corner,
         fill='white'
     )
     
     return img
 
-def generate_main_png():
+def save_png(img, png_path, compress_level=1):
+    """保存 RGBA 图像为 PNG，优先使用 fpnge，其次 cv2.imwrite 编码"""
+    # 调色板图像只能交给 Pillow 编码
+    if img.mode == 'P':
+        img.save(png_path, 'PNG', compress_level=compress_level, optimize=False)
+        return
+    # fpnge 不支持调节压缩级别，只用于快速编码，需要高压缩时交给 cv2/Pillow
+    if fpnge is not None and compress_level <= 1:
+        Path(png_path).write_bytes(fpnge.fromPIL(img))
+        return
+    if cv2 is None:
+        img.save(png_path, 'PNG', compress_level=compress_level, optimize=False)
+        return
+    arr = cv2.cvtColor(np.asarray(img), cv2.COLOR_RGBA2BGRA)
+    if not cv2.imwrite(str(png_path), arr, [cv2.IMWRITE_PNG_COMPRESSION, compress_level]):
+        raise OSError(f"无法写入 {png_path}")
+
+def generated_by_this_script():
+    """上次生成图标的是否为本脚本"""
+    return stamp_path.exists() and stamp_path.read_text(encoding="utf-8").strip() == Path(__file__).name
+
+def is_up_to_date(output_path, src_mtime):
+    """输出文件已存在且不早于所有输入时返回 True"""
+    return output_path.exists() and output_path.stat().st_mtime >= src_mtime
+
+@functools.lru_cache(maxsize=None)
+def get_master():
+    """绘制 1024px 母版 (只在确实需要时绘制一次)"""
+    return create_bot_icon(1024)
+
+def generate_main_png(src_mtime, release=False):
     """生成主 PNG 图标"""
     print("生成主 PNG 图标...")
-    img = create_bot_icon(1024)
     png_path = resources_dir / "icon.png"
-    img.save(png_path, 'PNG')
+    if is_up_to_date(png_path, src_mtime):
+        print("✓ icon.png 已是最新，跳过")
+        return
+    save_png(get_master(), png_path, 9 if release else 1)
     print(f"✓ icon.png 已生成")
 
-def generate_iconset():
+def generate_iconset(src_mtime, release=False):
     """生成 iconset 中的所有尺寸"""
     print("生成 iconset 图标...")
-    for size, name in sizes:
-        img = create_bot_icon(size)
-        png_path = iconset_dir / name
-        img.save(png_path, 'PNG')
+    stale = [(size, name) for size, name in sizes if not is_up_to_date(iconset_dir / name, src_mtime)]
+    if not stale:
+        print("✓ iconset 已是最新，跳过")
+        return
+    # 只绘制一次 1024px 母版，其余尺寸用 LANCZOS 缩放得到
+    master = get_master()
+    jobs = []
+    for size, name in stale:
+        img = master if size == master.width else master.resize((size, size), Image.LANCZOS)
+        if size <= 32:
+            # 16/32px 只有蓝、白、透明及少量边缘色，转为 16 色调色板 (保留 alpha) 以减小数据量；
+            # 更大尺寸的抗锯齿边缘会出现色带，保持 RGBA
+            img = img.quantize(colors=16, method=Image.FASTOCTREE)
+        # 默认用低压缩级别加快编码，发布时最终分发的 1024px 图标用最高压缩
+        compress_level = 9 if release and name == "icon_1024x1024.png" else 1
+        jobs.append((img, iconset_dir / name, compress_level))
+    
+    # PNG 编码在 C 层释放 GIL，用线程池让编码和写盘相互重叠
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        list(executor.map(lambda job: save_png(*job), jobs))
+    for size, name in stale:
         print(f"✓ {name} 已生成")
 
-def generate_icns():
+def generate_icns(src_mtime):
     """生成 ICNS (macOS)"""
     print("生成 ICNS 图标...")
     import subprocess
+    icns_path = resources_dir / "icon.icns"
+    # ICNS 由 iconset 打包而来，需要同时比较 iconset 中每个文件的修改时间
+    inputs_mtime = max([src_mtime] + [(iconset_dir / name).stat().st_mtime for _, name in sizes])
+    if is_up_to_date(icns_path, inputs_mtime):
+        print("✓ icon.icns 已是最新，跳过")
+        return
+    if icnsutil is not None:
+        # iconset 中的 PNG 已经编码好，直接装入 ICNS 容器，无需启动 iconutil
+        icns = icnsutil.IcnsFile()
+        for key, name in icns_media:
+            icns.add_media(key, data=(iconset_dir / name).read_bytes())
+        icns.write(str(icns_path), toc=True)
+        print("✓ icon.icns 已生成")
+        return
     try:
-        icns_path = resources_dir / "icon.icns"
         subprocess.run(
             ["iconutil", "-c", "icns", str(iconset_dir), "-o", str(icns_path)],
             check=True,
@@ -187,24 +331,20 @@ def generate_icns():
     except FileNotFoundError:
         print("iconutil 命令未找到，请确保在 macOS 上运行")
 
-def generate_ico():
+def generate_ico(src_mtime):
     """生成 ICO (Windows)"""
     print("生成 ICO 图标...")
+    ico_path = resources_dir / "icon.ico"
+    if is_up_to_date(ico_path, src_mtime):
+        print("✓ icon.ico 已是最新，跳过")
+        return
     try:
-        # 生成多个尺寸用于 ICO
+        # 由母版直接写出多个尺寸，缩放由 Pillow 在 C 层完成
         ico_sizes = [16, 32, 48, 64, 128, 256]
-        images = []
-        
-        for size in ico_sizes:
-            img = create_bot_icon(size)
-            images.append(img)
-        
-        # 保存为 ICO
-        ico_path = resources_dir / "icon.ico"
-        images[0].save(
+        get_master().save(
             ico_path,
             format='ICO',
-            sizes=[(img.width, img.height) for img in images]
+            sizes=[(size, size) for size in ico_sizes]
         )
         
         print("✓ icon.ico 已生成")
@@ -212,13 +352,35 @@ def generate_ico():
         print(f"生成 ICO 失败: {e}")
 
 def main():
+    parser = argparse.ArgumentParser(description="绘制 Bot 机器人应用图标")
+    parser.add_argument(
+        "--release",
+        action="store_true",
+        help="以最高压缩级别保存 icon.png 和 1024px 图标 (会重新生成所有图标)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="忽略修改时间，重新生成所有图标"
+    )
+    args = parser.parse_args()
+
     print("开始生成 Bot 机器人图标...\n")
     
+    # 输出文件比本脚本新时跳过；发布时需要重新压缩，按 --force 处理；
+    # 上次由另一个脚本生成时同样全部重新生成
+    if args.force or args.release or not generated_by_this_script():
+        src_mtime = float("inf")
+        stamp_path.unlink(missing_ok=True)
+    else:
+        src_mtime = Path(__file__).stat().st_mtime
+    
     try:
-        generate_main_png()
-        generate_iconset()
-        generate_icns()
-        generate_ico()
+        generate_main_png(src_mtime, args.release)
+        generate_iconset(src_mtime, args.release)
+        generate_icns(src_mtime)
+        generate_ico(src_mtime)
+        stamp_path.write_text(Path(__file__).name, encoding="utf-8")
         
         print("\n✓ 所有图标生成完成！")
         print("\n图标特点:")